@@ -1,45 +1,49 @@
-import uuid
-from src.models.models import Toy, Owner, Animal
-from src.services.database_manager import DatabaseManager
+import logging
 from src.repository_interface import IRepository
-from src.repositories.sqlalchemy_repository import SQLAlchemyRepository
+from src.utils.ids import fresh_id
+
+logger = logging.getLogger(__name__)
 
 def main(database_url):
     """
     Main function to perform database operations.
 
+    SQLAlchemy-backed modules are imported here rather than at module level,
+    so importing this module stays cheap until a database is actually used.
+
     Args:
         database_url (str): The database URL to connect to.
     """
+    from sqlalchemy.exc import SQLAlchemyError
+    from src.models.models import Toy, Owner, Animal
+    from src.services.database_manager import DatabaseManager
+    from src.repositories.sqlalchemy_repository import SQLAlchemyRepository
+
     try:
-        db_manager = DatabaseManager(database_url)
+        db_manager = DatabaseManager(database_url, create_schema=True)
 
         with db_manager.session_scope() as session:
             repository: IRepository = SQLAlchemyRepository(session)
 
-            # Create instances of Toy and Owner
-            toy = Toy(id=str(uuid.uuid4()), name="Chew Toy", toy_type="Rubber")
-            owner = Owner(id=str(uuid.uuid4()), name="John Doe", contact_info="john@example.com")
-
-            # Add Toy and Owner to the database
-            repository.add(toy)
-            repository.add(owner)
-
-            # Create Animal instance after Toy and Owner are added to the database
-            baxter = Animal(id=str(uuid.uuid4()), name="Baxter", age=5, favorite_toy_id=toy.id, owner_id=owner.id)
+            # Generate IDs upfront so the Animal row can reference the Toy and Owner
+            toy_id, owner_id, baxter_id = fresh_id(), fresh_id(), fresh_id()
 
-            # Add Animal to the database
-            repository.add(baxter)
+            # Insert plain rows, skipping the unit of work since no instances are needed back
+            repository.bulk_insert_mappings(Toy, [dict(id=toy_id, name="Chew Toy", toy_type="Rubber")])
+            repository.bulk_insert_mappings(Owner, [dict(id=owner_id, name="John Doe", contact_info="john@example.com")])
+            repository.bulk_insert_mappings(
+                Animal, [dict(id=baxter_id, name="Baxter", age=5, favorite_toy_id=toy_id, owner_id=owner_id)]
+            )
 
             # Query the database for an Animal with a specific ID and display its information
-            queried_animal = repository.get_by_id(Animal, baxter.id)
+            queried_animal = repository.get_by_id(Animal, baxter_id)
             if queried_animal:
                 print(f"Animal ID: {queried_animal.id}, Name: {queried_animal.name}, Age: {queried_animal.age}")
             else:
                 print("Animal not found.")
 
-    except Exception as e:
-        print(f"An error occurred: {str(e)}")
+    except SQLAlchemyError:
+        logger.exception("Database operation failed")
 
 if __name__ == '__main__':
     import os
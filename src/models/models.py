@@ -1,53 +1,81 @@
 import uuid
-from datetime import datetime
-from sqlalchemy import Column, String, Integer, ForeignKey
+from sqlalchemy import Column, DateTime, String, Integer, ForeignKey, Uuid, func
 from sqlalchemy.orm import declarative_base, relationship
-from src.constants.database_constants import DATABASE_TABLES, FOREIGN_KEYS, CLASSES
+from sqlalchemy.types import TypeDecorator, BINARY
+from src.constants.database_constants import TOY_TABLE, OWNER_TABLE, ANIMAL_TABLE
+from src.utils.ids import fresh_id
 
 Base = declarative_base()
 
+class GUID(TypeDecorator):
+    """UUID column type: native UUID where the backend has one, raw 16 bytes elsewhere."""
+    impl = BINARY(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.supports_native_uuid:
+            return dialect.type_descriptor(Uuid())
+        return dialect.type_descriptor(BINARY(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if not isinstance(value, uuid.UUID):
+            value = uuid.UUID(value)
+        return value if dialect.supports_native_uuid else value.bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        return uuid.UUID(bytes=value)
+
 class BaseEntity:
-    """Abstract base class for entities, providing ID and timestamp functionality."""
+    """Abstract base class for entities, providing ID functionality."""
+    __slots__ = ('_id',)
 
     def __init__(self, entity_id=None):
-        self._id = entity_id if entity_id is not None else str(uuid.uuid4())
-        self.timestamps = {
-            'created_at': datetime.now(),
-            'updated_at': datetime.now()
-        }
+        self._id = entity_id
 
     @property
     def id(self):
+        # Generated on first access, so entities given an id never draw a random one
+        if self._id is None:
+            self._id = fresh_id()
         return self._id
 
     @id.setter
     def id(self, value):
         raise AttributeError("ID is immutable and cannot be changed.")
 
-    def update_timestamp(self):
-        self.timestamps['updated_at'] = datetime.now()
+class TimestampMixin:
+    """Mixin adding creation and update timestamps maintained by the database."""
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
-class Toy(Base):
+class Toy(TimestampMixin, Base):
     """Model for Toy, representing toy data."""
-    __tablename__ = DATABASE_TABLES.toy
-    id = Column(String, primary_key=True)
+    __tablename__ = TOY_TABLE
+    __mapper_args__ = {'confirm_deleted_rows': False, 'eager_defaults': True}
+    id = Column(GUID(), primary_key=True, default=fresh_id)
     name = Column(String)
     toy_type = Column(String)
 
-class Owner(Base):
+class Owner(TimestampMixin, Base):
     """Model for Owner, representing owner data."""
-    __tablename__ = DATABASE_TABLES.owner
-    id = Column(String, primary_key=True)
+    __tablename__ = OWNER_TABLE
+    __mapper_args__ = {'confirm_deleted_rows': False, 'eager_defaults': True}
+    id = Column(GUID(), primary_key=True, default=fresh_id)
     name = Column(String)
     contact_info = Column(String)
 
-class Animal(Base):
+class Animal(TimestampMixin, Base):
     """Model for Animal, representing animal data with relationships to Toy and Owner."""
-    __tablename__ = DATABASE_TABLES.animal
-    id = Column(String, primary_key=True)
+    __tablename__ = ANIMAL_TABLE
+    __mapper_args__ = {'confirm_deleted_rows': False, 'eager_defaults': True}
+    id = Column(GUID(), primary_key=True, default=fresh_id)
     name = Column(String)
     age = Column(Integer)
-    favorite_toy_id = Column(String, ForeignKey(FOREIGN_KEYS.favorite_toy_id))
-    owner_id = Column(String, ForeignKey(FOREIGN_KEYS.owner_id))
-    favorite_toy = relationship(CLASSES.toy)
-    owner = relationship(CLASSES.owner)
+    favorite_toy_id = Column(GUID(), ForeignKey(Toy.id))
+    owner_id = Column(GUID(), ForeignKey(Owner.id))
+    favorite_toy = relationship(Toy, lazy="selectin")
+    owner = relationship(Owner, lazy="selectin")
@@ -1,26 +1,290 @@
-from sqlalchemy.orm import Session
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import count, islice
+from sqlalchemy import event, inspect, select, update as sa_update, delete as sa_delete
+from sqlalchemy.orm import Session, make_transient_to_detached, raiseload
+from sqlalchemy.orm.attributes import set_committed_value
 from ..repository_interface import IRepository
 
+# Column sets are built once per class and reused
+@lru_cache(maxsize=64)
+def _mapped_columns(entity_class):
+    return frozenset(attr.key for attr in inspect(entity_class).column_attrs)
+
+@lru_cache(maxsize=64)
+def _onupdate_columns(entity_class):
+    # Columns the database or the ORM fills in on every UPDATE, e.g. updated_at
+    return frozenset(
+        attr.key for attr in inspect(entity_class).column_attrs
+        if any(column.onupdate is not None or column.server_onupdate is not None for column in attr.columns)
+    )
+
+def _normalised_id(entity_id):
+    # The str and UUID forms of an id name the same row, so they must share cache
+    # and identity-map keys; strings that are not UUIDs are left as they are
+    if isinstance(entity_id, str):
+        try:
+            return uuid.UUID(entity_id)
+        except ValueError:
+            pass
+    return entity_id
+
+# Session.info keys under which a session collects the entities it looked up by id,
+# published to the shared cache only once its transaction commits, and the cache
+# keys it wrote, invalidated again at commit
+_PENDING_SNAPSHOTS = '_repository_pending_snapshots'
+_PENDING_INVALIDATIONS = '_repository_pending_invalidations'
+
 class SQLAlchemyRepository(IRepository):
+    """
+    Repository backed by a SQLAlchemy session.
+
+    Write methods only add or flush; committing is left to the caller, so they
+    should be used inside DatabaseManager.session_scope(), which commits on exit
+    and rolls back on error.
+    """
+    # Committed column values of entities looked up by id are shared across
+    # sessions for a short time, keyed on (engine, table name, id) and dropped
+    # whenever the entity is written; see _publish_snapshots. At most CACHE_SIZE
+    # entries are kept, least recently used first out
+    CACHE_TTL = 5.0
+    CACHE_SIZE = 1024
+    _cache = OrderedDict()
+    _cache_lock = threading.Lock()
+    # Every invalidation takes the next generation; a snapshot read before its
+    # key's last invalidation is never published. Records beyond CACHE_SIZE are
+    # dropped oldest first, raising the floor every older read is held to
+    _generation = 0
+    _invalidated = OrderedDict()
+    _invalidated_floor = 0
+    # Engines are keyed by a token rather than held, so disposed ones can be collected
+    _engine_tokens = weakref.WeakKeyDictionary()
+    _next_engine_token = count(1).__next__
+
     def __init__(self, session: Session):
         self.session = session
 
     def add(self, entity):
         self.session.add(entity)
-        self.session.commit()
+        self._invalidate(type(entity), entity.id)
+
+    def add_many(self, entities, batch_size=1000):
+        # Consume the iterable in slices so generators are never fully materialized
+        iterator = iter(entities)
+        while batch := list(islice(iterator, batch_size)):
+            self.session.add_all(batch)
+            self.session.flush()
+            for entity in batch:
+                self._invalidate(type(entity), entity.id)
+
+    def bulk_insert_mappings(self, entity_class, mappings):
+        self.session.bulk_insert_mappings(entity_class, mappings)
+        for mapping in mappings:
+            self._invalidate(entity_class, mapping.get('id'))
 
     def get_by_id(self, entity_class, entity_id):
-        return self.session.query(entity_class).filter_by(id=entity_id).first()
+        entity_id = _normalised_id(entity_id)
+        # The session's own copy wins, since it may hold changes from this transaction
+        entity = self._loaded(entity_class, entity_id)
+        if entity is not None:
+            return entity
+        key = self._cache_key(entity_class, entity_id)
+        with self._cache_lock:
+            snapshot = self._cached_snapshot(key)
+            read_at = self._generation
+        if snapshot is not None:
+            # Rebuild a clean persistent instance owned by this session only
+            entity = entity_class(**snapshot)
+            make_transient_to_detached(entity)
+            self.session.add(entity)
+            return entity
+        entity = self.session.get(entity_class, entity_id)
+        if entity is not None:
+            # Held strongly until the transaction ends, as the identity map is weak-referencing
+            self.session.info.setdefault(_PENDING_SNAPSHOTS, {})[key] = entity, read_at
+        return entity
+
+    def get_all(self, entity_class, *loader_options):
+        return self.session.execute(select(entity_class).options(*loader_options)).scalars().all()
 
+    def query_strict(self, entity_class, *loader_options):
+        # Any relationship not covered by loader_options raises on access instead of lazy loading
+        stmt = select(entity_class).options(*loader_options, raiseload('*'))
+        return self.session.execute(stmt).scalars().all()
+
+    # update and delete run one UPDATE/DELETE with the id as a literal criterion, so
+    # the session's default synchronization can evaluate it against loaded instances
+    # in Python instead of fetching the matched rows back; SQLAlchemy caches the
+    # compiled statement per class regardless of the id
     def update(self, entity_class, entity_id, **kwargs):
-        entity = self.get_by_id(entity_class, entity_id)
-        if entity:
-            for key, value in kwargs.items():
-                setattr(entity, key, value)
-            self.session.commit()
+        entity_id = _normalised_id(entity_id)
+        values = self._changed_values(entity_class, entity_id, kwargs)
+        if not values:
+            # Nothing to write, but a missing row must still raise as it would below
+            if self._loaded(entity_class, entity_id) is None and self.session.get(entity_class, entity_id) is None:
+                raise KeyError(f"{entity_class.__name__} with id {entity_id} not found.")
+            return
+        stmt = sa_update(entity_class).where(entity_class.id == entity_id).values(**values)
+        # Session sync only applies the values given here, so a loaded instance also
+        # needs the columns generated on update, fetched in the same statement where
+        # the backend supports RETURNING and refreshed afterwards otherwise
+        loaded = self._loaded(entity_class, entity_id)
+        generated = sorted(_onupdate_columns(entity_class) - values.keys()) if loaded is not None else ()
+        dialect = self.session.get_bind(mapper=inspect(entity_class)).dialect
+        if generated and dialect.update_returning:
+            stmt = stmt.returning(*(getattr(entity_class, key) for key in generated))
+            row = self.session.execute(stmt).first()
+            found = row is not None
+            if found:
+                for key in generated:
+                    set_committed_value(loaded, key, row._mapping[key])
+        else:
+            found = self.session.execute(stmt).rowcount > 0
+            if found and generated:
+                self.session.refresh(loaded, generated)
+        self._invalidate(entity_class, entity_id)
+        if not found:
+            raise KeyError(f"{entity_class.__name__} with id {entity_id} not found.")
 
     def delete(self, entity_class, entity_id):
-        entity = self.get_by_id(entity_class, entity_id)
-        if entity:
-            self.session.delete(entity)
-            self.session.commit()
+        entity_id = _normalised_id(entity_id)
+        stmt = sa_delete(entity_class).where(entity_class.id == entity_id)
+        result = self.session.execute(stmt)
+        self._invalidate(entity_class, entity_id)
+        if result.rowcount == 0:
+            raise KeyError(f"{entity_class.__name__} with id {entity_id} not found.")
+
+    # The *_many methods emit one IN statement per batch of ids, kept well under
+    # the bind-parameter limits of MSSQL (2100) and Oracle (1000). They skip
+    # session synchronization, so instances already loaded in the session keep
+    # their old state until expired or refreshed.
+    def update_many(self, entity_class, entity_ids, batch_size=500, **kwargs):
+        # Unmapped keys are ignored, as in update()
+        columns = _mapped_columns(entity_class)
+        values = {key: value for key, value in kwargs.items() if key in columns}
+        if not values:
+            return 0
+        updated = 0
+        for batch in self._id_batches(entity_class, entity_ids, batch_size):
+            stmt = sa_update(entity_class).where(entity_class.id.in_(batch)).values(**values)
+            updated += self.session.execute(stmt, execution_options={'synchronize_session': False}).rowcount
+        return updated
+
+    def delete_many(self, entity_class, entity_ids, batch_size=500):
+        deleted = 0
+        for batch in self._id_batches(entity_class, entity_ids, batch_size):
+            stmt = sa_delete(entity_class).where(entity_class.id.in_(batch))
+            deleted += self.session.execute(stmt, execution_options={'synchronize_session': False}).rowcount
+        return deleted
+
+    def _changed_values(self, entity_class, entity_id, kwargs):
+        # Keys that are not mapped columns are ignored, as plain setattr used to do
+        columns = _mapped_columns(entity_class)
+        values = {key: value for key, value in kwargs.items() if key in columns}
+        # If the entity is already loaded, drop values it already holds; only loaded
+        # attributes are compared, so this never triggers a SELECT of its own
+        loaded = self._loaded(entity_class, entity_id)
+        if loaded is not None:
+            state = inspect(loaded).dict
+            values = {k: v for k, v in values.items() if k not in state or state[k] != v}
+        return values
+
+    def _id_batches(self, entity_class, entity_ids, batch_size):
+        iterator = iter(entity_ids)
+        while batch := list(islice(iterator, batch_size)):
+            for entity_id in batch:
+                self._invalidate(entity_class, entity_id)
+            yield batch
+
+    def _loaded(self, entity_class, entity_id):
+        key = inspect(entity_class).identity_key_from_primary_key((_normalised_id(entity_id),))
+        return self.session.identity_map.get(key)
+
+    def _cache_key(self, entity_class, entity_id):
+        # Keyed per engine rather than per URL, as separate in-memory databases share one URL
+        engine = self.session.get_bind(mapper=inspect(entity_class)).engine
+        with self._cache_lock:
+            token = self._engine_tokens.get(engine)
+            if token is None:
+                token = self._engine_tokens[engine] = self._next_engine_token()
+        return token, entity_class.__tablename__, _normalised_id(entity_id)
+
+    @classmethod
+    def _cached_snapshot(cls, key):
+        # Called with _cache_lock held
+        cached = cls._cache.get(key)
+        if cached is None:
+            return None
+        snapshot, stored_at = cached
+        if time.monotonic() - stored_at >= cls.CACHE_TTL:
+            del cls._cache[key]
+            return None
+        cls._cache.move_to_end(key)
+        return snapshot
+
+    @classmethod
+    def _store_snapshot(cls, key, snapshot, read_at, stored_at):
+        # Called with _cache_lock held; rows written after this snapshot was read are left out
+        if cls._invalidated.get(key, cls._invalidated_floor) > read_at:
+            return
+        cls._cache[key] = snapshot, stored_at
+        cls._cache.move_to_end(key)
+        while len(cls._cache) > cls.CACHE_SIZE:
+            cls._cache.popitem(last=False)
+
+    @classmethod
+    def clear_cache(cls):
+        with cls._cache_lock:
+            cls._cache.clear()
+            cls._invalidated.clear()
+            cls._invalidated_floor = cls._generation
+
+    def _invalidate(self, entity_class, entity_id):
+        key = self._cache_key(entity_class, entity_id)
+        self.session.info.get(_PENDING_SNAPSHOTS, {}).pop(key, None)
+        # Invalidated again at commit, since other sessions may read the old row until then
+        self.session.info.setdefault(_PENDING_INVALIDATIONS, set()).add(key)
+        self._invalidate_keys((key,))
+
+    @classmethod
+    def _invalidate_keys(cls, keys):
+        with cls._cache_lock:
+            for key in keys:
+                cls._generation += 1
+                cls._invalidated[key] = cls._generation
+                cls._invalidated.move_to_end(key)
+                cls._cache.pop(key, None)
+            while len(cls._invalidated) > cls.CACHE_SIZE:
+                _, cls._invalidated_floor = cls._invalidated.popitem(last=False)
+
+@event.listens_for(Session, "after_commit")
+def _publish_snapshots(session):
+    """Cache the committed column values of entities this session looked up by id."""
+    written = session.info.pop(_PENDING_INVALIDATIONS, None)
+    if written:
+        SQLAlchemyRepository._invalidate_keys(written)
+    pending = session.info.pop(_PENDING_SNAPSHOTS, None)
+    if not pending:
+        return
+    snapshots = []
+    for key, (entity, read_at) in pending.items():
+        state = inspect(entity)
+        if not state.persistent or state.session is not session:
+            continue
+        columns = _mapped_columns(type(entity))
+        # Entities with expired or unloaded columns are skipped rather than refreshed
+        if columns <= state.dict.keys():
+            snapshots.append((key, {column: state.dict[column] for column in columns}, read_at))
+    stored_at = time.monotonic()
+    with SQLAlchemyRepository._cache_lock:
+        for key, snapshot, read_at in snapshots:
+            SQLAlchemyRepository._store_snapshot(key, snapshot, read_at, stored_at)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_snapshots(session):
+    session.info.pop(_PENDING_SNAPSHOTS, None)
+    session.info.pop(_PENDING_INVALIDATIONS, None)
@@ -5,10 +5,26 @@ class IRepository(ABC):
     def add(self, entity):
         pass
 
+    @abstractmethod
+    def add_many(self, entities, batch_size=1000):
+        pass
+
+    @abstractmethod
+    def bulk_insert_mappings(self, entity_class, mappings):
+        pass
+
     @abstractmethod
     def get_by_id(self, entity_class, entity_id):
         pass
 
+    @abstractmethod
+    def get_all(self, entity_class, *loader_options):
+        pass
+
+    @abstractmethod
+    def query_strict(self, entity_class, *loader_options):
+        pass
+
     @abstractmethod
     def update(self, entity_class, entity_id, **kwargs):
         pass
@@ -16,3 +32,11 @@ class IRepository(ABC):
     @abstractmethod
     def delete(self, entity_class, entity_id):
         pass
+
+    @abstractmethod
+    def update_many(self, entity_class, entity_ids, batch_size=500, **kwargs):
+        pass
+
+    @abstractmethod
+    def delete_many(self, entity_class, entity_ids, batch_size=500):
+        pass
@@ -1,26 +1,159 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import logging
+import sqlite3
+import threading
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool, StaticPool
+from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
 from contextlib import contextmanager
 from src.models.models import Base
 
+logger = logging.getLogger(__name__)
+
+# Engines and session factories are shared per database URL and pool settings,
+# so repeated DatabaseManager construction is cheap
+_ENGINE_CACHE = {}
+_ENGINE_LOCK = threading.Lock()
+
+# URLs whose schema has already been created in this process
+_INITIALIZED = set()
+_SCHEMA_LOCK = threading.Lock()
+
+# Session.info key marking a session as owned by an open session_scope()
+_SCOPE_OPEN = '_database_manager_scope_open'
+
+@event.listens_for(Engine, "connect")
+def _sqlite_pragmas(dbapi_connection, _connection_record):
+    """Switch SQLite connections to WAL journaling so commits do not fsync every time."""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+def _engine_options(database_url, pool_size=10, max_overflow=20, pool_timeout=30):
+    """
+    Build the create_engine keyword arguments for a database URL.
+
+    In-memory SQLite uses a single shared connection, since each new connection
+    there would open a separate, empty database. Everything else gets a sized
+    connection pool, shared across threads for file-backed SQLite. psycopg2 and
+    pyodbc are switched to their batched executemany modes.
+
+    Args:
+        database_url (str): The database URL to connect to.
+        pool_size (int): Number of connections kept open in the pool.
+        max_overflow (int): Extra connections allowed beyond pool_size under load.
+        pool_timeout (int): Seconds to wait for a free connection before failing.
+
+    Returns:
+        dict: Keyword arguments for create_engine.
+    """
+    options = {'query_cache_size': 1200}
+    url = make_url(database_url)
+    if _is_memory_sqlite(url):
+        # Recycling or pinging the only connection would drop the database with it
+        options.update(poolclass=StaticPool, connect_args={'check_same_thread': False})
+        return options
+    options.update(
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+    )
+    if url.get_backend_name() == 'sqlite':
+        options.update(poolclass=QueuePool, connect_args={'check_same_thread': False})
+    elif url.get_backend_name() == 'postgresql' and url.get_driver_name() == 'psycopg2':
+        options.update(
+            executemany_mode='values_plus_batch',
+            insertmanyvalues_page_size=1000,
+            executemany_batch_page_size=500,
+        )
+    elif url.get_backend_name() == 'mssql' and url.get_driver_name() == 'pyodbc':
+        options['fast_executemany'] = True
+    return options
+
+def _ensure_schema(engine):
+    """
+    Create the tables for an engine, once per database URL per process.
+
+    Args:
+        engine (Engine): The engine to create the tables on.
+    """
+    # Every in-memory SQLite engine is its own database, so track those by engine
+    key = engine if _is_memory_sqlite(engine.url) else str(engine.url)
+    with _SCHEMA_LOCK:
+        if key in _INITIALIZED:
+            return
+        Base.metadata.create_all(engine, checkfirst=True)
+        _INITIALIZED.add(key)
+
+def _build(database_url, pool_size, max_overflow, pool_timeout):
+    """
+    Create the engine and session factory for a database URL and cache them.
+
+    Args:
+        database_url (str): The database URL to connect to.
+        pool_size (int): Number of connections kept open in the pool.
+        max_overflow (int): Extra connections allowed beyond pool_size under load.
+        pool_timeout (int): Seconds to wait for a free connection before failing.
+
+    Returns:
+        tuple: The (engine, scoped_session) pair for the URL.
+    """
+    key = (database_url, pool_size, max_overflow, pool_timeout)
+    with _ENGINE_LOCK:
+        cached = _ENGINE_CACHE.get(key)
+        if cached is not None:
+            return cached
+        engine = create_engine(database_url, **_engine_options(database_url, pool_size, max_overflow, pool_timeout))
+        # Sessions are reused per thread, and objects stay readable after commit without a refresh
+        session_factory = scoped_session(sessionmaker(bind=engine, expire_on_commit=False))
+        cached = _ENGINE_CACHE[key] = (engine, session_factory)
+        return cached
+
 class DatabaseManager:
     """Database manager class for handling database operations."""
 
-    def __init__(self, database_url):
-        self.engine = create_engine(database_url, pool_pre_ping=True, pool_recycle=3600)
-        self.Session = sessionmaker(bind=self.engine)
-        Base.metadata.create_all(self.engine)
+    def __init__(self, database_url, pool_size=10, max_overflow=20, pool_timeout=30, create_schema=False):
+        self.engine, self.Session = (
+            _ENGINE_CACHE.get((database_url, pool_size, max_overflow, pool_timeout))
+            or _build(database_url, pool_size, max_overflow, pool_timeout)
+        )
+        if create_schema:
+            self.init_schema()
+
+    def init_schema(self):
+        """Create any missing tables, at most once per database per process."""
+        _ensure_schema(self.engine)
 
     @contextmanager
     def session_scope(self):
         session = self.Session()
+        # Nested scopes share the thread's session; only the outermost one commits and closes it
+        if session.info.get(_SCOPE_OPEN):
+            yield session
+            return
+        session.info[_SCOPE_OPEN] = True
         try:
             yield session
             session.commit()
         except SQLAlchemyError as e:
             session.rollback()
-            print(f"Session rollback because of error: {e}")
+            logger.warning("Session rollback due to error: %s", e)
             raise
         finally:
+            session.info.pop(_SCOPE_OPEN, None)
             session.close()
+
+    def remove_session(self):
+        """Discard the current thread's session, e.g. at the end of a request."""
+        self.Session.remove()
@@ -0,0 +1,29 @@
+import os
+import threading
+import uuid
+
+# Random bytes are drawn from the OS in bulk and handed out 16 at a time,
+# so generating an ID does not cost one os.urandom() call per entity
+_POOL_SIZE = 4096
+_pool = bytearray()
+_pool_lock = threading.Lock()
+
+# A forked child would otherwise hand out the same bytes as its parent
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_pool.clear)
+
+def fresh_id():
+    """
+    Generate a random (version 4) UUID from the shared byte pool.
+
+    Returns:
+        uuid.UUID: The generated UUID.
+    """
+    with _pool_lock:
+        if not _pool:
+            _pool.extend(os.urandom(_POOL_SIZE))
+        b = _pool[-16:]
+        del _pool[-16:]
+    b[6] = (b[6] & 0x0f) | 0x40
+    b[8] = (b[8] & 0x3f) | 0x80
+    return uuid.UUID(bytes=bytes(b))
@@ -0,0 +1,29 @@
+import contextlib
+import pytest
+from sqlalchemy import event
+
+@contextlib.contextmanager
+def _count_queries(connectable):
+    """
+    Collect every SQL statement executed on an engine or connection.
+
+    Args:
+        connectable: The engine or connection to listen on.
+
+    Yields:
+        list: The statements executed inside the block, in order.
+    """
+    statements = []
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(connectable, "before_cursor_execute", _before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(connectable, "before_cursor_execute", _before_cursor_execute)
+
+@pytest.fixture
+def count_queries():
+    return _count_queries
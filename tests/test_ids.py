@@ -0,0 +1,34 @@
+import os
+import unittest
+import uuid
+from src.utils.ids import fresh_id
+
+class TestFreshId(unittest.TestCase):
+
+    def test_fresh_id_is_version_4_uuid(self):
+        generated = fresh_id()
+        self.assertIsInstance(generated, uuid.UUID)
+        self.assertEqual(generated.version, 4)
+        self.assertEqual(generated.variant, uuid.RFC_4122)
+
+    def test_fresh_id_unique_across_pool_refills(self):
+        ids = {fresh_id() for _ in range(1000)}
+        self.assertEqual(len(ids), 1000)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+    def test_forked_child_does_not_repeat_parent_ids(self):
+        fresh_id()
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            os.write(write_fd, fresh_id().bytes)
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd, 'rb') as reader:
+            child_id = uuid.UUID(bytes=reader.read())
+        os.waitpid(pid, 0)
+        self.assertNotEqual(child_id, fresh_id())
+
+if __name__ == '__main__':
+    unittest.main()
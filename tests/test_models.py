@@ -0,0 +1,81 @@
+import unittest
+import uuid
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateTable
+from src.models.models import Animal, BaseEntity, GUID, Owner, Toy
+
+class TestBaseEntity(unittest.TestCase):
+
+    def test_generates_id_when_missing(self):
+        entity = BaseEntity()
+        self.assertTrue(entity.id)
+        self.assertNotEqual(entity.id, BaseEntity().id)
+
+    def test_generated_id_is_stable(self):
+        entity = BaseEntity()
+        self.assertEqual(entity.id, entity.id)
+
+    def test_keeps_given_id(self):
+        self.assertEqual(BaseEntity('1').id, '1')
+
+    def test_id_is_immutable(self):
+        entity = BaseEntity('1')
+        with self.assertRaises(AttributeError):
+            entity.id = '2'
+
+    def test_has_no_instance_dict(self):
+        entity = BaseEntity('1')
+        self.assertFalse(hasattr(entity, '__dict__'))
+
+class TestGUID(unittest.TestCase):
+
+    def setUp(self):
+        self.guid = GUID()
+        self.value = uuid.UUID('12345678-1234-4678-9234-567812345678')
+
+    def test_binds_as_16_bytes_without_native_uuid(self):
+        dialect = sqlite.dialect()
+        self.assertEqual(self.guid.process_bind_param(self.value, dialect), self.value.bytes)
+        self.assertEqual(self.guid.process_bind_param(str(self.value), dialect), self.value.bytes)
+        self.assertIsNone(self.guid.process_bind_param(None, dialect))
+
+    def test_binds_as_uuid_with_native_uuid(self):
+        dialect = postgresql.dialect()
+        self.assertEqual(self.guid.process_bind_param(str(self.value), dialect), self.value)
+
+    def test_loads_as_uuid(self):
+        self.assertEqual(self.guid.process_result_value(self.value.bytes, sqlite.dialect()), self.value)
+        self.assertEqual(self.guid.process_result_value(self.value, postgresql.dialect()), self.value)
+        self.assertIsNone(self.guid.process_result_value(None, sqlite.dialect()))
+
+    def test_column_ddl_per_dialect(self):
+        self.assertIn('id BINARY(16)', str(CreateTable(Toy.__table__).compile(dialect=sqlite.dialect())))
+        self.assertIn('id UUID', str(CreateTable(Toy.__table__).compile(dialect=postgresql.dialect())))
+
+class TestAnimal(unittest.TestCase):
+
+    def test_relationships_load_with_selectin(self):
+        self.assertEqual(Animal.favorite_toy.property.lazy, 'selectin')
+        self.assertEqual(Animal.owner.property.lazy, 'selectin')
+
+class TestTimestampMixin(unittest.TestCase):
+
+    def test_timestamps_set_by_database(self):
+        for model in (Toy, Owner, Animal):
+            columns = model.__table__.c
+            self.assertIsNotNone(columns.created_at.server_default)
+            self.assertIsNotNone(columns.updated_at.server_default)
+            self.assertIsNotNone(columns.updated_at.onupdate)
+
+class TestMapperOptions(unittest.TestCase):
+
+    def test_no_extra_round_trips_on_write(self):
+        for model in (Toy, Owner, Animal):
+            self.assertFalse(model.__mapper__.confirm_deleted_rows)
+
+    def test_server_defaults_fetched_on_flush(self):
+        for model in (Toy, Owner, Animal):
+            self.assertTrue(model.__mapper__.eager_defaults)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,44 +1,135 @@
+import gc
+from datetime import datetime
+import time
 import unittest
-from unittest.mock import MagicMock
+import uuid
+import weakref
+from unittest.mock import MagicMock, patch
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session, joinedload, raiseload, selectinload
+from sqlalchemy.pool import StaticPool
 from src.repositories.sqlalchemy_repository import SQLAlchemyRepository
-from src.models.models import Toy, Owner, Animal
+from src.models.models import Base, Toy, Owner, Animal
+from src.utils.ids import fresh_id
 
 class TestSQLAlchemyRepository(unittest.TestCase):
 
     def setUp(self):
+        SQLAlchemyRepository.clear_cache()
         self.session = MagicMock()
+        self.session.identity_map.get.return_value = None
         self.repository = SQLAlchemyRepository(self.session)
 
+    def tearDown(self):
+        SQLAlchemyRepository.clear_cache()
+
     def test_add_entity(self):
         toy = Toy(id='1', name='Toy', toy_type='Type')
         self.repository.add(toy)
         self.session.add.assert_called_with(toy)
-        self.session.commit.assert_called_once()
+        self.session.commit.assert_not_called()
+
+    def test_add_many_in_batches(self):
+        toys = (Toy(id=str(i), name='Toy', toy_type='Type') for i in range(5))
+        self.repository.add_many(toys, batch_size=2)
+        batches = [call.args[0] for call in self.session.add_all.call_args_list]
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(self.session.flush.call_count, 3)
+        self.session.commit.assert_not_called()
+
+    def test_bulk_insert_mappings(self):
+        rows = [dict(id='1', name='Chew Toy', toy_type='Rubber'), dict(id='2', name='Ball', toy_type='Rubber')]
+        self.repository.bulk_insert_mappings(Toy, rows)
+        self.session.bulk_insert_mappings.assert_called_once_with(Toy, rows)
+        self.session.add.assert_not_called()
 
     def test_get_by_id(self):
         self.repository.get_by_id(Toy, '1')
-        self.session.query(Toy).filter_by(id='1').first.assert_called_once()
+        self.session.get.assert_called_once_with(Toy, '1')
+
+    def test_get_all_with_loader_options(self):
+        self.session.execute.return_value.scalars.return_value.all.return_value = ['animal']
+        animals = self.repository.get_all(Animal, selectinload(Animal.owner))
+        self.assertEqual(animals, ['animal'])
+        stmt = self.session.execute.call_args.args[0]
+        self.assertTrue(str(stmt).startswith('SELECT animals.id'))
 
     def test_update_entity(self):
-        toy = Toy(id='1', name='Toy', toy_type='Type')
-        self.session.query(Toy).filter_by(id='1').first.return_value = toy
+        self.session.execute.return_value.rowcount = 1
         self.repository.update(Toy, '1', name='Updated Toy', toy_type='Updated Type')
-        self.assertEqual(toy.name, 'Updated Toy')
-        self.assertEqual(toy.toy_type, 'Updated Type')
-        self.session.commit.assert_called_once()
+        stmt, = self.session.execute.call_args.args
+        self.assertTrue(str(stmt).startswith('UPDATE toys SET'))
+        self.assertEqual(stmt.compile().params, {'name': 'Updated Toy', 'toy_type': 'Updated Type', 'id_1': '1'})
+        self.session.get.assert_not_called()
+        self.session.commit.assert_not_called()
 
     def test_delete_entity(self):
-        toy = Toy(id='1', name='Toy', toy_type='Type')
-        self.session.query(Toy).filter_by(id='1').first.return_value = toy
+        self.session.execute.return_value.rowcount = 1
         self.repository.delete(Toy, '1')
-        self.session.delete.assert_called_with(toy)
-        self.session.commit.assert_called_once()
+        stmt, = self.session.execute.call_args.args
+        self.assertTrue(str(stmt).startswith('DELETE FROM toys'))
+        self.assertEqual(stmt.compile().params, {'id_1': '1'})
+        self.session.get.assert_not_called()
+        self.session.delete.assert_not_called()
+        self.session.commit.assert_not_called()
+
+    def test_update_ignores_unmapped_keys(self):
+        self.session.execute.return_value.rowcount = 1
+        self.repository.update(Toy, '1', name='Updated Toy', nickname='Chewy')
+        stmt, = self.session.execute.call_args.args
+        self.assertEqual(stmt.compile().params, {'name': 'Updated Toy', 'id_1': '1'})
+        self.repository.update(Toy, '1', nickname='Chewy')
+        self.assertEqual(self.session.execute.call_count, 1)
+
+    def test_update_missing_entity_raises(self):
+        self.session.execute.return_value.rowcount = 0
+        with self.assertRaises(KeyError):
+            self.repository.update(Toy, '1', name='Updated Toy')
+
+    def test_update_without_values_checks_entity_exists(self):
+        self.session.get.return_value = None
+        with self.assertRaises(KeyError):
+            self.repository.update(Toy, '1', nickname='Chewy')
+        self.session.execute.assert_not_called()
+
+    def test_delete_missing_entity_raises(self):
+        self.session.execute.return_value.rowcount = 0
+        with self.assertRaises(KeyError):
+            self.repository.delete(Toy, '1')
+
+    def test_update_many_in_batches(self):
+        self.session.execute.return_value.rowcount = 2
+        updated = self.repository.update_many(Toy, ['1', '2', '3'], batch_size=2, toy_type='Plush')
+        self.assertEqual(updated, 4)
+        self.assertEqual(self.session.execute.call_count, 2)
+        first, second = self.session.execute.call_args_list
+        self.assertEqual(first.args[0].compile().params, {'toy_type': 'Plush', 'id_1': ['1', '2']})
+        self.assertEqual(second.args[0].compile().params, {'toy_type': 'Plush', 'id_1': ['3']})
+        self.assertEqual(first.kwargs['execution_options'], {'synchronize_session': False})
+
+    def test_update_many_ignores_unmapped_keys(self):
+        self.session.execute.return_value.rowcount = 1
+        self.repository.update_many(Toy, ['1'], toy_type='Plush', nickname='Chewy')
+        stmt = self.session.execute.call_args.args[0]
+        self.assertEqual(stmt.compile().params, {'toy_type': 'Plush', 'id_1': ['1']})
+        self.assertEqual(self.repository.update_many(Toy, ['1'], nickname='Chewy'), 0)
+        self.assertEqual(self.session.execute.call_count, 1)
+
+    def test_delete_many_in_batches(self):
+        self.session.execute.return_value.rowcount = 1
+        deleted = self.repository.delete_many(Toy, iter(['1', '2', '3']), batch_size=2)
+        self.assertEqual(deleted, 2)
+        statements = [call.args[0] for call in self.session.execute.call_args_list]
+        self.assertTrue(str(statements[0]).startswith('DELETE FROM toys'))
+        self.assertEqual(statements[1].compile().params, {'id_1': ['3']})
 
     def test_add_owner(self):
         owner = Owner(id='1', name='John Doe', contact_info='john@example.com')
         self.repository.add(owner)
         self.session.add.assert_called_with(owner)
-        self.session.commit.assert_called_once()
+        self.session.commit.assert_not_called()
 
     def test_add_animal(self):
         toy = Toy(id='1', name='Chew Toy', toy_type='Rubber')
@@ -46,7 +137,253 @@ class TestSQLAlchemyRepository(unittest.TestCase):
         animal = Animal(id='3', name='Baxter', age=5, favorite_toy_id=toy.id, owner_id=owner.id)
         self.repository.add(animal)
         self.session.add.assert_called_with(animal)
-        self.session.commit.assert_called_once()
+        self.session.commit.assert_not_called()
+
+    def test_add_many_single_batch(self):
+        toy = Toy(id='1', name='Chew Toy', toy_type='Rubber')
+        owner = Owner(id='2', name='John Doe', contact_info='john@example.com')
+        self.repository.add_many([toy, owner])
+        self.session.add_all.assert_called_once_with([toy, owner])
+        self.session.flush.assert_called_once()
+        self.session.commit.assert_not_called()
+
+class TestSQLAlchemyRepositoryIntegration(unittest.TestCase):
+
+    def setUp(self):
+        SQLAlchemyRepository.clear_cache()
+        self.addCleanup(SQLAlchemyRepository.clear_cache)
+        self.engine = create_engine('sqlite://', poolclass=StaticPool)
+        self.addCleanup(self.engine.dispose)
+        Base.metadata.create_all(self.engine)
+        self.session = Session(self.engine)
+        self.addCleanup(self.session.close)
+        self.repository = SQLAlchemyRepository(self.session)
+        toy = Toy(id=fresh_id(), name='Chew Toy', toy_type='Rubber')
+        owner = Owner(id=fresh_id(), name='John Doe', contact_info='john@example.com')
+        animal = Animal(id=fresh_id(), name='Baxter', age=5, favorite_toy_id=toy.id, owner_id=owner.id)
+        self.toy_id = toy.id
+        self.repository.add_many([toy, owner, animal])
+        self.session.commit()
+        self.session.expunge_all()
+
+    def _other_repository(self, engine=None):
+        session = Session(engine or self.engine)
+        self.addCleanup(session.close)
+        return SQLAlchemyRepository(session)
+
+    def _publish_toy(self):
+        self.repository.get_by_id(Toy, self.toy_id)
+        self.session.commit()
+
+    def test_get_by_id_served_from_cache_after_commit(self):
+        self._publish_toy()
+        other = self._other_repository()
+        with patch.object(other.session, 'get') as get:
+            toy = other.get_by_id(Toy, self.toy_id)
+        get.assert_not_called()
+        self.assertEqual(toy.name, 'Chew Toy')
+        self.assertIn(toy, other.session)
+        self.assertNotIn(toy, self.session)
+        self.assertFalse(other.session.dirty)
+
+    def test_get_by_id_cache_expires(self):
+        self._publish_toy()
+        other = self._other_repository()
+        later = time.monotonic() + SQLAlchemyRepository.CACHE_TTL
+        with patch('src.repositories.sqlalchemy_repository.time.monotonic', return_value=later):
+            with patch.object(other.session, 'get', wraps=other.session.get) as get:
+                other.get_by_id(Toy, self.toy_id)
+        get.assert_called_once()
+
+    def test_expired_entry_dropped_on_read(self):
+        self._publish_toy()
+        later = time.monotonic() + SQLAlchemyRepository.CACHE_TTL
+        with patch('src.repositories.sqlalchemy_repository.time.monotonic', return_value=later):
+            self._other_repository().get_by_id(Toy, self.toy_id)
+        self.assertEqual(len(SQLAlchemyRepository._cache), 0)
+
+    def test_cache_evicts_least_recently_used(self):
+        toy_ids = [fresh_id() for _ in range(3)]
+        self.repository.add_many(Toy(id=toy_id, name='Ball', toy_type='Rubber') for toy_id in toy_ids)
+        self.session.commit()
+        self.session.expunge_all()
+        with patch.object(SQLAlchemyRepository, 'CACHE_SIZE', 2):
+            for toy_id in toy_ids:
+                self.repository.get_by_id(Toy, toy_id)
+                self.session.commit()
+                self.session.expunge_all()
+        cached_ids = {key[-1] for key in SQLAlchemyRepository._cache}
+        self.assertEqual(cached_ids, set(toy_ids[1:]))
+
+    def test_cache_does_not_keep_engine_alive(self):
+        engine = create_engine('sqlite://', poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.add(Toy(id=self.toy_id, name='Chew Toy', toy_type='Rubber'))
+            session.commit()
+        with Session(engine) as session:
+            SQLAlchemyRepository(session).get_by_id(Toy, self.toy_id)
+            session.commit()
+        self.assertEqual(len(SQLAlchemyRepository._cache), 1)
+        engine.dispose()
+        engine_ref = weakref.ref(engine)
+        del engine, session
+        gc.collect()
+        self.assertIsNone(engine_ref())
+
+    def test_uncommitted_lookup_not_shared(self):
+        toy = Toy(name='Ball', toy_type='Rubber')
+        self.repository.add(toy)
+        self.session.flush()
+        self.repository.get_by_id(Toy, toy.id)
+        self.session.rollback()
+        self.assertIsNone(self._other_repository().get_by_id(Toy, toy.id))
+
+    def test_dirty_instance_not_shared(self):
+        toy = self.repository.get_by_id(Toy, self.toy_id)
+        toy.name = 'Renamed'
+        self.assertEqual(self._other_repository().get_by_id(Toy, self.toy_id).name, 'Chew Toy')
+
+    def test_write_invalidates_cache(self):
+        self._publish_toy()
+        writer = self._other_repository()
+        writer.update(Toy, self.toy_id, name='Squeaky Toy')
+        writer.session.commit()
+        self.assertEqual(self._other_repository().get_by_id(Toy, self.toy_id).name, 'Squeaky Toy')
+
+    def test_write_invalidates_cache_for_str_id(self):
+        self.repository.get_by_id(Toy, str(self.toy_id))
+        self.session.commit()
+        writer = self._other_repository()
+        writer.update(Toy, self.toy_id, name='Squeaky Toy')
+        writer.session.commit()
+        self.assertEqual(self._other_repository().get_by_id(Toy, str(self.toy_id)).name, 'Squeaky Toy')
+
+    def test_snapshot_read_before_write_not_published(self):
+        self.repository.get_by_id(Toy, self.toy_id)
+        writer = self._other_repository()
+        writer.update(Toy, self.toy_id, name='Squeaky Toy')
+        writer.session.commit()
+        self.session.commit()
+        self.assertEqual(self._other_repository().get_by_id(Toy, self.toy_id).name, 'Squeaky Toy')
+
+    def test_cache_keyed_per_engine(self):
+        self._publish_toy()
+        engine = create_engine('sqlite://', poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        self.addCleanup(engine.dispose)
+        self.assertIsNone(self._other_repository(engine).get_by_id(Toy, self.toy_id))
+
+    def test_unloaded_relationship_raises(self):
+        animal, = self.repository.query_strict(Animal)
+        with self.assertRaises(InvalidRequestError):
+            animal.owner
+
+    def test_requested_relationships_load(self):
+        animal, = self.repository.query_strict(Animal, selectinload(Animal.owner), selectinload(Animal.favorite_toy))
+        self.assertEqual(animal.owner.name, 'John Doe')
+        self.assertEqual(animal.favorite_toy.name, 'Chew Toy')
+
+    def test_insert_without_ids_generates_them(self):
+        self.repository.bulk_insert_mappings(Owner, [dict(name='Jane Doe'), dict(name='Jim Doe')])
+        self.repository.add_many([Toy(name='Ball', toy_type='Rubber'), Toy(name='Rope', toy_type='Cotton')])
+        owners = self.repository.get_all(Owner)
+        toys = self.repository.get_all(Toy)
+        self.assertEqual(len(owners), 3)
+        self.assertEqual(len(toys), 3)
+        self.assertTrue(all(isinstance(entity.id, uuid.UUID) for entity in owners + toys))
+
+    def test_update_skips_unchanged_loaded_values(self):
+        toy = self.repository.get_by_id(Toy, self.toy_id)
+        with patch.object(self.session, 'execute', wraps=self.session.execute) as execute:
+            self.repository.update(Toy, self.toy_id, name='Chew Toy', toy_type='Rubber')
+            execute.assert_not_called()
+            self.repository.update(Toy, self.toy_id, name='Chew Toy', toy_type='Plush')
+            stmt, = execute.call_args.args
+        self.assertEqual(set(stmt.compile().params), {'toy_type', 'id_1'})
+        self.assertEqual(toy.toy_type, 'Plush')
+
+    def test_update_without_changes_raises_for_missing_entity(self):
+        self.repository.update(Toy, self.toy_id, nickname='Chewy')
+        with self.assertRaises(KeyError):
+            self.repository.update(Toy, fresh_id(), nickname='Chewy')
+
+    def test_timestamps_filled_in_by_database(self):
+        toy = self.repository.get_by_id(Toy, self.toy_id)
+        self.assertIsNotNone(toy.created_at)
+        self.assertIsNotNone(toy.updated_at)
+
+    def _assert_update_refreshes_updated_at(self):
+        long_ago = datetime(2000, 1, 1)
+        self.repository.update_many(Toy, [self.toy_id], updated_at=long_ago)
+        toy = self.repository.get_by_id(Toy, self.toy_id)
+        self.assertEqual(toy.updated_at, long_ago)
+        self.repository.update(Toy, self.toy_id, name='Squeaky Toy')
+        self.session.close()
+        self.assertGreater(toy.updated_at, long_ago)
+
+    def test_update_refreshes_loaded_updated_at(self):
+        self._assert_update_refreshes_updated_at()
+
+    def test_update_refreshes_loaded_updated_at_without_returning(self):
+        with patch.object(self.engine.dialect, 'update_returning', False):
+            self._assert_update_refreshes_updated_at()
+
+    def test_update_and_delete_sync_loaded_entity(self):
+        toy = self.repository.get_by_id(Toy, self.toy_id)
+        self.repository.update(Toy, self.toy_id, name='Squeaky Toy')
+        self.assertEqual(toy.name, 'Squeaky Toy')
+        self.repository.delete(Toy, self.toy_id)
+        self.assertNotIn(toy, self.session)
+
+@pytest.fixture
+def animal_session():
+    engine = create_engine('sqlite://', poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    owners = [Owner(id=fresh_id(), name=f'Owner {i}') for i in range(10)]
+    toys = [Toy(id=fresh_id(), name=f'Toy {i}') for i in range(10)]
+    animals = [
+        Animal(id=fresh_id(), name=f'Animal {i}', favorite_toy_id=toy.id, owner_id=owner.id)
+        for i, (toy, owner) in enumerate(zip(toys, owners))
+    ]
+    session.add_all(owners + toys + animals)
+    session.commit()
+    session.expunge_all()
+    yield session
+    session.close()
+    engine.dispose()
+
+def test_loading_animals_does_not_query_per_relationship(animal_session, count_queries):
+    repository = SQLAlchemyRepository(animal_session)
+    with count_queries(animal_session.get_bind()) as queries:
+        animals = repository.get_all(Animal)
+        names = [(animal.owner.name, animal.favorite_toy.name) for animal in animals]
+    assert len(names) == 10
+    # One SELECT for the animals plus one selectin load per relationship, regardless of row count
+    assert len(queries) <= 3
+
+def test_get_all_applies_loader_options(animal_session, count_queries):
+    repository = SQLAlchemyRepository(animal_session)
+    with count_queries(animal_session.get_bind()) as queries:
+        animals = repository.get_all(Animal, joinedload(Animal.owner), raiseload(Animal.favorite_toy))
+    # The owner is joined into the one SELECT and the favorite toy's selectin load is replaced
+    assert len(queries) == 1
+    assert 'JOIN owners' in queries[0]
+    assert all(animal.owner.name.startswith('Owner') for animal in animals)
+    with pytest.raises(InvalidRequestError):
+        animals[0].favorite_toy
+
+def test_update_and_delete_by_id_sync_in_one_statement_each(animal_session, count_queries):
+    repository = SQLAlchemyRepository(animal_session)
+    toy = animal_session.scalars(select(Toy).limit(1)).one()
+    with count_queries(animal_session.get_bind()) as queries:
+        repository.update(Toy, str(toy.id), name='Squeaky Toy')
+        repository.delete(Toy, str(toy.id))
+    assert toy.name == 'Squeaky Toy'
+    assert toy not in animal_session
+    assert len(queries) == 2
+    assert not any(statement.startswith('SELECT') for statement in queries)
 
 if __name__ == '__main__':
     unittest.main()